@@ -7,13 +7,13 @@ echo "🔧 Instalando dependências do sistema de automação de leads..."
 
 # Verificar se Python está instalado
 if ! command -v python3 &> /dev/null; then
-    echo "❌ Python 3 não encontrado. Instale Python 3.8+ primeiro."
+    echo "❌ Python 3 não encontrado. Instale Python 3.11+ primeiro."
     exit 1
 fi
 
 # Verificar versão do Python
 PYTHON_VERSION=$(python3 -c 'import sys; print(".".join(map(str, sys.version_info[:2])))')
-REQUIRED_VERSION="3.8"
+REQUIRED_VERSION="3.11"
 
 if [ "$(printf '%s\n' "$REQUIRED_VERSION" "$PYTHON_VERSION" | sort -V | head -n1)" != "$REQUIRED_VERSION" ]; then
     echo "❌ Python $PYTHON_VERSION encontrado. Requer Python $REQUIRED_VERSION ou superior."
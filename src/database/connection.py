@@ -1,27 +1,65 @@
 import sqlite3
 import os
+import threading
 from pathlib import Path
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Optional
 from ..utils.config import get_database_path
 from ..utils.logger import setup_logger
 
 logger = setup_logger()
 
+# PRAGMAs aplicados a cada nova conexão (journal_mode é persistido no arquivo)
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",      # ~64MB de cache de páginas
+    "PRAGMA mmap_size=268435456",    # 256MB
+    "PRAGMA busy_timeout=5000",
+)
+
 class DatabaseConnection:
-    """Gerenciador de conexão com SQLite"""
+    """Gerenciador de conexão com SQLite (conexão única e reutilizada)"""
     
     def __init__(self):
         self.db_path = get_database_path()
+        # RLock permite reentrância quando um método do repository chama outro
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._depth = 0  # Nível de aninhamento de get_connection
         self._ensure_database_exists()
     
     def _ensure_database_exists(self):
         """Garante que o banco de dados e tabelas existam"""
-        if not os.path.exists(self.db_path):
-            logger.info(f"Criando banco de dados: {self.db_path}")
+        # Verificar antes de conectar, pois o connect cria o arquivo
+        db_exists = os.path.exists(self.db_path)
+        self._conn = self._connect()
+        
+        if not db_exists:
+            logger.info("Criando banco de dados: %s", self.db_path)
             self._create_tables()
         else:
-            logger.debug(f"Banco de dados encontrado: {self.db_path}")
+            logger.debug("Banco de dados encontrado: %s", self.db_path)
+            # Bancos existentes também recebem índices adicionados depois
+            self._create_indexes()
+        
+        # WAL persiste no arquivo, basta configurar uma vez
+        if self.db_path != ':memory:':
+            with self.get_connection() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abre a conexão de longa duração e aplica os PRAGMAs uma única vez"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,  # Autocommit; transações explícitas via BEGIN
+            cached_statements=128
+        )
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row  # Permite acesso por nome da coluna
+        return conn
     
     def _create_tables(self):
         """Cria as tabelas necessárias"""
@@ -68,27 +106,61 @@ class DatabaseConnection:
                 )
             """)
             
-            # Índices para performance
+            conn.commit()
+        
+        self._create_indexes()
+        
+        logger.info("Tabelas criadas com sucesso")
+    
+    def _create_indexes(self):
+        """Cria os índices de performance (idempotente)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_cnpj ON leads(cnpj)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_execution_logs_date ON execution_logs(execution_date)")
             
-            conn.commit()
-            logger.info("Tabelas criadas com sucesso")
+            # Índice de cobertura: get_statistics lê só o índice, sem acessar a tabela.
+            # Também atende as buscas por created_at, que antes tinham índice próprio
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_stats ON leads(created_at, status, email_sent)")
+            cursor.execute("DROP INDEX IF EXISTS idx_leads_created_at")
+            
+            # Índice parcial para as consultas de leads pendentes/com falha
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status)
+                WHERE status IN ('pending', 'failed')
+            """)
     
     @contextmanager
     def get_connection(self) -> Generator[sqlite3.Connection, None, None]:
-        """Context manager para conexão com o banco"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Permite acesso por nome da coluna
-            yield conn
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            logger.error(f"Erro na conexão com banco: {e}")
-            raise
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+        """Context manager para acesso à conexão compartilhada"""
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException as e:
+                # Só o nível mais externo desfaz a transação; níveis internos
+                # (ex.: dentro de um savepoint) apenas propagam o erro.
+                # BaseException cobre também cancelamento (CancelledError) e Ctrl-C,
+                # para a conexão compartilhada não ficar presa em um BEGIN aberto.
+                if self._depth == 1:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    if isinstance(e, Exception):
+                        logger.error("Erro na conexão com banco: %s", e)
+                raise
+            finally:
+                self._depth -= 1
+    
+    def close(self):
+        """Atualiza as estatísticas do planner e fecha a conexão compartilhada"""
+        with self._lock:
+            if self._conn:
+                # PRAGMA optimize só analisa tabelas que esta conexão consultou,
+                # por isso roda ao final da execução e não na abertura
+                try:
+                    self._conn.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    logger.warning("Falha ao executar PRAGMA optimize: %s", e)
+                self._conn.close()
+                self._conn = None
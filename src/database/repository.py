@@ -1,5 +1,7 @@
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Generator, List, Optional, Dict, Any, Set, Tuple
 from ..models.company import Company
 from ..models.lead import Lead
 from .connection import DatabaseConnection
@@ -7,95 +9,247 @@ from ..utils.logger import setup_logger
 
 logger = setup_logger()
 
+# SQL fixo em constantes de módulo para reaproveitar o cache de statements do sqlite3
+# Placeholders preenchidos por lote (limitado por SQLITE_MAX_VARIABLE_NUMBER)
+_SQL_EXISTING_CNPJS = "SELECT cnpj FROM leads WHERE cnpj IN ({})"
+_MAX_SQL_PARAMS = 900
+
+_SQL_INSERT_LEAD = """
+    INSERT INTO leads (
+        cnpj, razao_social, nome_fantasia, email, telefone,
+        endereco, cidade, estado, cep, data_abertura,
+        atividade_principal, situacao, crm_lead_id,
+        email_sent, created_at, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(cnpj) DO NOTHING
+"""
+
+# Variante para inserções unitárias: devolve o id apenas se a linha foi inserida
+_SQL_INSERT_LEAD_RETURNING = _SQL_INSERT_LEAD + "    RETURNING id\n"
+
+# Parâmetros None mantêm o valor atual da coluna
+_SQL_UPDATE_LEAD_STATUS = """
+    UPDATE leads
+    SET status = ?,
+        updated_at = ?,
+        crm_lead_id = COALESCE(?, crm_lead_id),
+        email_sent = COALESCE(?, email_sent)
+    WHERE cnpj = ?
+"""
+
+# Intervalo semiaberto [início, fim) para usar idx_leads_created_at
+_SQL_LEADS_BY_DATE = """
+    SELECT * FROM leads 
+    WHERE created_at >= ? AND created_at < ?
+    ORDER BY created_at DESC
+"""
+
+_SQL_STATS_TOTALS = """
+    SELECT COUNT(*) as total_leads,
+           SUM(CASE WHEN status = 'processed' THEN 1 ELSE 0 END) as processed,
+           SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
+           SUM(CASE WHEN email_sent = 1 THEN 1 ELSE 0 END) as emails_sent
+    FROM leads 
+    WHERE created_at >= ?
+"""
+
+# created_at é ISO 8601, então os 10 primeiros caracteres são a data
+_SQL_DAILY_COUNTS = """
+    SELECT substr(created_at, 1, 10) as date, COUNT(*) as count
+    FROM leads 
+    WHERE created_at >= ?
+    GROUP BY substr(created_at, 1, 10)
+    ORDER BY date DESC
+"""
+
+_SQL_LEAD_BY_CNPJ = "SELECT * FROM leads WHERE cnpj = ?"
+
+_SQL_INSERT_EXECUTION_LOG = """
+    INSERT INTO execution_logs (
+        execution_date, leads_found, leads_processed,
+        leads_duplicated, leads_failed, execution_time_seconds,
+        status, error_message, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+@dataclass(slots=True)
+class TransactionContext:
+    """Dados compartilhados pelas operações de uma mesma transação"""
+    now_iso: str  # Timestamp único usado em created_at/updated_at do lote
+
 class LeadRepository:
     """Repository para operações com leads no banco de dados"""
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.db = DatabaseConnection()
+        self._tx: Optional[TransactionContext] = None
+    
+    def _now_iso(self) -> str:
+        """Timestamp da transação corrente ou, fora dela, o instante atual"""
+        if self._tx is not None:
+            return self._tx.now_iso
+        return datetime.now().isoformat()
+    
+    @contextmanager
+    def transaction(self) -> Generator[TransactionContext, None, None]:
+        """
+        Agrupa as operações em uma única transação (BEGIN IMMEDIATE ... COMMIT)
+        
+        A conexão opera em autocommit; fora deste bloco cada statement
+        é confirmado individualmente. Em caso de erro ou interrupção
+        (inclusive cancelamento da tarefa) é feito ROLLBACK.
+        O timestamp é calculado uma vez na abertura e reutilizado pelas
+        gravações feitas dentro do bloco.
+        """
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._tx = TransactionContext(now_iso=datetime.now().isoformat())
+            try:
+                yield self._tx
+            finally:
+                self._tx = None
+            conn.execute("COMMIT")
+    
+    @contextmanager
+    def savepoint(self, name: str = "lead") -> Generator[None, None, None]:
+        """
+        Isola um trecho dentro da transação corrente
+        
+        Em caso de erro desfaz apenas o trecho (ROLLBACK TO) e propaga a
+        exceção, mantendo o restante da transação intacto.
+        """
+        with self.db.get_connection() as conn:
+            conn.execute(f"SAVEPOINT {name}")
+            try:
+                yield
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {name}")
+                conn.execute(f"RELEASE {name}")
+                raise
+            conn.execute(f"RELEASE {name}")
     
     def lead_exists(self, cnpj: str) -> bool:
         """Verifica se um lead já existe no banco"""
+        return bool(self.existing_cnpjs([cnpj]))
+    
+    def existing_cnpjs(self, cnpjs: List[str]) -> Set[str]:
+        """Retorna, em uma única consulta por lote, os CNPJs já cadastrados"""
+        existing = set()
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM leads WHERE cnpj = ?", (cnpj,))
-            return cursor.fetchone() is not None
+            
+            for start in range(0, len(cnpjs), _MAX_SQL_PARAMS):
+                chunk = cnpjs[start:start + _MAX_SQL_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(_SQL_EXISTING_CNPJS.format(placeholders), chunk)
+                existing.update(row['cnpj'] for row in cursor.fetchall())
+        
+        return existing
     
-    def save_lead(self, company: Company, crm_lead_id: Optional[str] = None, email_sent: bool = False) -> int:
-        """Salva um lead no banco de dados"""
+    @staticmethod
+    def _lead_row(company: Company, crm_lead_id: Optional[str], email_sent: bool, now: str) -> Tuple:
+        """Monta a tupla de parâmetros para _SQL_INSERT_LEAD"""
+        # Colunas NOT NULL recebem '' quando a API não trouxe o campo
+        return (
+            company.cnpj,
+            company.razao_social or '',
+            company.nome_fantasia,
+            company.email,
+            company.telefone,
+            company.endereco,
+            company.cidade or '',
+            company.estado or '',
+            company.cep,
+            company.data_abertura.isoformat(),
+            company.atividade_principal or '',
+            company.situacao or '',
+            crm_lead_id,
+            email_sent,
+            now,
+            'processed' if crm_lead_id else 'pending'
+        )
+    
+    def save_lead(self, company: Company, crm_lead_id: Optional[str] = None, email_sent: bool = False) -> Optional[int]:
+        """
+        Salva um lead no banco de dados
+        
+        Returns:
+            ID do lead inserido, ou None se o CNPJ já existia
+        """
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
-            now = datetime.now().isoformat()
-            
-            cursor.execute("""
-                INSERT INTO leads (
-                    cnpj, razao_social, nome_fantasia, email, telefone,
-                    endereco, cidade, estado, cep, data_abertura,
-                    atividade_principal, situacao, crm_lead_id,
-                    email_sent, created_at, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                company.cnpj,
-                company.razao_social,
-                company.nome_fantasia,
-                company.email,
-                company.telefone,
-                company.endereco,
-                company.cidade,
-                company.estado,
-                company.cep,
-                company.data_abertura.isoformat(),
-                company.atividade_principal,
-                company.situacao,
-                crm_lead_id,
-                email_sent,
-                now,
-                'processed' if crm_lead_id else 'pending'
-            ))
+            now = self._now_iso()
             
-            lead_id = cursor.lastrowid
-            conn.commit()
+            # O ON CONFLICT faz a verificação de duplicado e a inserção de uma vez
+            cursor.execute(_SQL_INSERT_LEAD_RETURNING, self._lead_row(company, crm_lead_id, email_sent, now))
+            row = cursor.fetchone()
+            
+            if row is None:
+                logger.debug("Lead já existente no banco: CNPJ %s", company.cnpj)
+                return None
             
-            logger.debug(f"Lead salvo no banco: ID {lead_id}, CNPJ {company.cnpj}")
+            lead_id = row['id']
+            
+            logger.debug("Lead salvo no banco: ID %s, CNPJ %s", lead_id, company.cnpj)
             return lead_id
     
-    def update_lead_status(self, cnpj: str, status: str, crm_lead_id: Optional[str] = None, email_sent: Optional[bool] = None):
-        """Atualiza status de um lead"""
+    def save_leads_bulk(self, leads: List[Tuple[Company, Optional[str], bool]]) -> int:
+        """
+        Salva vários leads com um único executemany
+        
+        CNPJs já existentes são ignorados pelo ON CONFLICT, sem erro.
+        
+        Args:
+            leads: Tuplas (company, crm_lead_id, email_sent)
+            
+        Returns:
+            Quantidade de leads efetivamente inseridos
+        """
+        if not leads:
+            return 0
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
-            now = datetime.now().isoformat()
-            
-            # Construir query dinamicamente
-            updates = ["status = ?", "updated_at = ?"]
-            params = [status, now]
+            now = self._now_iso()
             
-            if crm_lead_id is not None:
-                updates.append("crm_lead_id = ?")
-                params.append(crm_lead_id)
+            cursor.executemany(_SQL_INSERT_LEAD, [
+                self._lead_row(company, crm_lead_id, email_sent, now)
+                for company, crm_lead_id, email_sent in leads
+            ])
             
-            if email_sent is not None:
-                updates.append("email_sent = ?")
-                params.append(email_sent)
+            logger.debug("%s leads salvos no banco em lote", cursor.rowcount)
+            return cursor.rowcount
+    
+    def update_lead_status(self, cnpj: str, status: str, crm_lead_id: Optional[str] = None, email_sent: Optional[bool] = None):
+        """
+        Atualiza status de um lead
+        
+        Usa sempre o mesmo UPDATE (_SQL_UPDATE_LEAD_STATUS) para reaproveitar
+        o statement em cache; crm_lead_id/email_sent como None mantêm o
+        valor atual da coluna.
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
             
-            params.append(cnpj)
+            now = self._now_iso()
             
-            query = f"UPDATE leads SET {', '.join(updates)} WHERE cnpj = ?"
-            cursor.execute(query, params)
-            conn.commit()
+            cursor.execute(_SQL_UPDATE_LEAD_STATUS, (status, now, crm_lead_id, email_sent, cnpj))
             
-            logger.debug(f"Lead atualizado: CNPJ {cnpj}, Status {status}")
+            logger.debug("Lead atualizado: CNPJ %s, Status %s", cnpj, status)
     
     def get_leads_by_date(self, date: str) -> List[Dict[str, Any]]:
         """Busca leads por data de criação"""
+        day = datetime.fromisoformat(date).date()
+        start = f"{day.isoformat()}T00:00:00"
+        end = f"{(day + timedelta(days=1)).isoformat()}T00:00:00"
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM leads 
-                WHERE DATE(created_at) = DATE(?)
-                ORDER BY created_at DESC
-            """, (date,))
+            cursor.execute(_SQL_LEADS_BY_DATE, (start, end))
             
             return [dict(row) for row in cursor.fetchall()]
     
@@ -103,7 +257,7 @@ class LeadRepository:
         """Busca lead por CNPJ"""
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM leads WHERE cnpj = ?", (cnpj,))
+            cursor.execute(_SQL_LEAD_BY_CNPJ, (cnpj,))
             
             row = cursor.fetchone()
             return dict(row) if row else None
@@ -113,26 +267,16 @@ class LeadRepository:
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
+            # Corte calculado no mesmo formato de created_at e passado como parâmetro
+            cutoff = (datetime.now() - timedelta(days=int(days))).isoformat()
+            
             # Total de leads
-            cursor.execute("""
-                SELECT COUNT(*) as total_leads,
-                       SUM(CASE WHEN status = 'processed' THEN 1 ELSE 0 END) as processed,
-                       SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
-                       SUM(CASE WHEN email_sent = 1 THEN 1 ELSE 0 END) as emails_sent
-                FROM leads 
-                WHERE created_at >= datetime('now', '-{} days')
-            """.format(days))
+            cursor.execute(_SQL_STATS_TOTALS, (cutoff,))
             
             stats = dict(cursor.fetchone())
             
             # Leads por dia
-            cursor.execute("""
-                SELECT DATE(created_at) as date, COUNT(*) as count
-                FROM leads 
-                WHERE created_at >= datetime('now', '-{} days')
-                GROUP BY DATE(created_at)
-                ORDER BY date DESC
-            """.format(days))
+            cursor.execute(_SQL_DAILY_COUNTS, (cutoff,))
             
             stats['daily_counts'] = [dict(row) for row in cursor.fetchall()]
             
@@ -146,22 +290,15 @@ class LeadRepository:
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
-            now = datetime.now().isoformat()
+            now = self._now_iso()
             
-            cursor.execute("""
-                INSERT INTO execution_logs (
-                    execution_date, leads_found, leads_processed,
-                    leads_duplicated, leads_failed, execution_time_seconds,
-                    status, error_message, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            cursor.execute(_SQL_INSERT_EXECUTION_LOG, (
                 execution_date, leads_found, leads_processed,
                 leads_duplicated, leads_failed, execution_time,
                 status, error_message, now
             ))
             
             log_id = cursor.lastrowid
-            conn.commit()
             
-            logger.debug(f"Log de execução salvo: ID {log_id}")
+            logger.debug("Log de execução salvo: ID %s", log_id)
             return log_id
\ No newline at end of file
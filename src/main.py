@@ -7,12 +7,205 @@ Execução: python src/main.py
 import sys
 import asyncio
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from src.models.company import Company
 from src.services.cnpja_service import CNPJAService
 from src.services.crm_service import CRMService
 from src.services.gclick_service import GClickService
 from src.database.repository import LeadRepository
 from src.utils.logger import setup_logger
 from src.utils.config import load_config
+from src.utils.http import shutdown_http
+
+# Quantidade de leads acumulados antes de gravar no banco
+BULK_INSERT_SIZE = 500
+
+# Consumidores simultâneos (CRM + e-mail) quando não configurado
+DEFAULT_CONCURRENCY = 10
+
+# Empresas aguardando processamento entre o produtor (CNPJá) e os consumidores
+QUEUE_SIZE = 256
+
+async def _process_company(company: Company, crm: CRMService, gclick: GClickService,
+                           logger, lead_id: Optional[str] = None) -> Tuple[Company, Optional[str], bool]:
+    """Cadastra a empresa no CRM (se ainda não cadastrada em lote) e dispara o e-mail"""
+    # Cadastrar no CRM
+    if lead_id is None:
+        lead_id = await crm.create_lead(company)
+        logger.info("✅ Lead criado no CRM: %s", lead_id)
+    
+    # Disparar e-mail
+    email_sent = await gclick.send_email(company)
+    
+    if email_sent:
+        logger.info("📧 E-mail enviado para: %s", company.email)
+    else:
+        logger.warning("⚠️  Falha no envio de e-mail: %s", company.email)
+    
+    return company, lead_id, email_sent
+
+def _save_leads_one_by_one(db: LeadRepository, pending: List[Tuple[Company, Optional[str], bool]],
+                           logger) -> Tuple[int, int]:
+    """
+    Grava os leads individualmente, cada um em seu savepoint
+    
+    Returns:
+        Tupla (leads gravados, leads com falha)
+    """
+    saved = failed = 0
+    for company, crm_lead_id, email_sent in pending:
+        try:
+            with db.savepoint():
+                lead_id = db.save_lead(company, crm_lead_id, email_sent)
+        except Exception as e:
+            failed += 1
+            logger.error("❌ Erro ao salvar lead %s: %s", company.cnpj, e)
+            continue
+        
+        if lead_id is not None:
+            saved += 1
+    return saved, failed
+
+def _flush_leads(db: LeadRepository, pending: List[Tuple[Company, Optional[str], bool]],
+                 logger) -> Tuple[int, int, int]:
+    """
+    Grava o lote pendente de leads em uma transação curta e esvazia a lista
+    
+    Se o executemany falhar, o lote é desfeito e regravado um a um, para
+    que só as linhas problemáticas sejam perdidas.
+    
+    Returns:
+        Tupla (leads gravados, leads já existentes no banco, leads com falha)
+    """
+    batch_size = len(pending)
+    if not batch_size:
+        return 0, 0, 0
+    
+    try:
+        # Uma transação por lote: o lock de escrita não fica preso durante as chamadas HTTP
+        with db.transaction():
+            try:
+                with db.savepoint("bulk"):
+                    inserted = db.save_leads_bulk(pending)
+                failed = 0
+            except Exception as e:
+                logger.warning("⚠️  Falha ao gravar lote de %s leads, gravando um a um: %s", batch_size, e)
+                inserted, failed = _save_leads_one_by_one(db, pending, logger)
+        # CNPJs gravados por outra execução após a verificação inicial
+        return inserted, batch_size - inserted - failed, failed
+    
+    except Exception as e:
+        logger.error("❌ Erro ao salvar lote de %s leads: %s", batch_size, e)
+        return 0, 0, batch_size
+    
+    finally:
+        pending.clear()
+
+async def _run_pipeline(search_date: str, cnpja: CNPJAService, crm: CRMService,
+                        gclick: GClickService, db: LeadRepository,
+                        concurrency: int, logger) -> Dict[str, int]:
+    """
+    Busca as empresas no CNPJá e as processa à medida que as páginas chegam
+    
+    Um produtor lê as páginas do CNPJá, descarta duplicados e enfileira as
+    empresas novas; `concurrency` consumidores cadastram no CRM, disparam o
+    e-mail e gravam os leads em lote, enquanto as próximas páginas são buscadas.
+    
+    O que já foi concluído é gravado antes de cada nova página e ao final,
+    mesmo em caso de erro, para que leads já criados no CRM e com e-mail
+    enviado não sejam refeitos na próxima execução.
+    
+    Returns:
+        Contadores da execução (found, processed, duplicated, failed)
+    """
+    stats = {'found': 0, 'processed': 0, 'duplicated': 0, 'failed': 0}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    
+    # Leads aguardando gravação em lote: (company, crm_lead_id, email_sent)
+    pending: List[Tuple[Company, Optional[str], bool]] = []
+    seen: Set[str] = set()
+    # IDs de leads já criados no CRM em lote (quando suportado), por CNPJ
+    bulk_lead_ids: Dict[str, Optional[str]] = {}
+    # Falha na leitura do CNPJá, propagada depois que os consumidores terminam
+    producer_errors: List[Exception] = []
+    
+    def flush():
+        saved, duplicated, failed = _flush_leads(db, pending, logger)
+        stats['processed'] += saved
+        stats['duplicated'] += duplicated
+        stats['failed'] += failed
+    
+    async def produce():
+        try:
+            async for companies in cnpja.iter_pages(search_date):
+                stats['found'] += len(companies)
+                
+                # CNPJs já cadastrados, uma consulta por página
+                existing = db.existing_cnpjs([company.cnpj for company in companies])
+                new_companies: List[Company] = []
+                
+                for company in companies:
+                    # Verificar duplicados (no banco e dentro da própria execução)
+                    if company.cnpj in existing or company.cnpj in seen:
+                        stats['duplicated'] += 1
+                        logger.debug("⚠️  Lead duplicado ignorado: %s", company.cnpj)
+                        continue
+                    
+                    seen.add(company.cnpj)
+                    new_companies.append(company)
+                
+                # Uma requisição ao CRM por página; recusados são refeitos individualmente
+                if crm.supports_bulk and new_companies:
+                    try:
+                        lead_ids = await crm.create_leads_bulk(new_companies)
+                        bulk_lead_ids.update(zip((company.cnpj for company in new_companies), lead_ids))
+                    except Exception as e:
+                        logger.warning("⚠️  Lote do CRM falhou, cadastrando individualmente: %s", e)
+                
+                for company in new_companies:
+                    await queue.put(company)
+                
+                # Gravar o que já foi concluído antes de buscar a próxima página
+                flush()
+        
+        except Exception as e:
+            # Não cancelar os consumidores: as empresas já enfileiradas são concluídas e gravadas
+            producer_errors.append(e)
+        
+        # Um sinal de parada por consumidor (em caso de cancelamento o TaskGroup os cancela)
+        for _ in range(concurrency):
+            await queue.put(None)
+    
+    async def consume():
+        while (company := await queue.get()) is not None:
+            try:
+                result = await _process_company(company, crm, gclick, logger,
+                                                bulk_lead_ids.pop(company.cnpj, None))
+            except Exception as e:
+                stats['failed'] += 1
+                logger.error("❌ Erro ao processar %s: %s", company.cnpj, e)
+                continue
+            
+            pending.append(result)
+            if len(pending) >= BULK_INSERT_SIZE:
+                flush()
+    
+    try:
+        # As tarefas não propagam Exception (falhas são contadas ou guardadas em
+        # producer_errors); o TaskGroup garante que um cancelamento externo
+        # encerre o produtor e todos os consumidores
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            for _ in range(concurrency):
+                tg.create_task(consume())
+    finally:
+        # Gravar os leads concluídos mesmo se a execução for interrompida
+        flush()
+    
+    if producer_errors:
+        raise producer_errors[0]
+    
+    return stats
 
 async def main():
     """Função principal de execução"""
@@ -20,73 +213,50 @@ async def main():
     # Setup
     config = load_config()
     logger = setup_logger()
+    db: Optional[LeadRepository] = None
     
     try:
         logger.info("🚀 Iniciando automação de leads...")
         
-        # Instanciar serviços
-        cnpja = CNPJAService(config)
-        crm = CRMService(config)
-        gclick = GClickService(config)
         db = LeadRepository(config)
+        concurrency = config.get('processing', {}).get('concurrency', DEFAULT_CONCURRENCY)
         
-        # Data de busca (ontem)
-        yesterday = datetime.now() - timedelta(days=1)
-        search_date = yesterday.strftime("%Y-%m-%d")
+        # Instanciar serviços (cada um mantém uma sessão HTTP durante a execução)
+        async with CNPJAService(config) as cnpja, \
+                CRMService(config) as crm, \
+                GClickService(config) as gclick:
+            # Data de busca (ontem)
+            yesterday = datetime.now() - timedelta(days=1)
+            search_date = yesterday.strftime("%Y-%m-%d")
+            
+            logger.info("📅 Buscando empresas criadas em: %s", search_date)
+            
+            # Buscar empresas no CNPJá e processar (CRM + e-mail + banco local)
+            stats = await _run_pipeline(search_date, cnpja, crm, gclick, db, concurrency, logger)
         
-        logger.info(f"📅 Buscando empresas criadas em: {search_date}")
+        logger.info("🏢 Encontradas %s empresas", stats['found'])
         
-        # 1. Buscar empresas no CNPJá
-        companies = await cnpja.get_companies_by_date(search_date)
-        logger.info(f"🏢 Encontradas {len(companies)} empresas")
-        
-        if not companies:
+        if not stats['found']:
             logger.info("❌ Nenhuma empresa encontrada para hoje")
             return
         
-        leads_processed = 0
-        leads_duplicated = 0
-        leads_failed = 0
-        
-        # 2. Processar cada empresa
-        for company in companies:
-            try:
-                # Verificar duplicados
-                if db.lead_exists(company.cnpj):
-                    leads_duplicated += 1
-                    logger.debug(f"⚠️  Lead duplicado ignorado: {company.cnpj}")
-                    continue
-                
-                # Cadastrar no CRM
-                lead_id = await crm.create_lead(company)
-                logger.info(f"✅ Lead criado no CRM: {lead_id}")
-                
-                # Disparar e-mail
-                email_sent = await gclick.send_email(company)
-                
-                if email_sent:
-                    logger.info(f"📧 E-mail enviado para: {company.email}")
-                else:
-                    logger.warning(f"⚠️  Falha no envio de e-mail: {company.email}")
-                
-                # Salvar no banco local
-                db.save_lead(company, lead_id)
-                leads_processed += 1
-                
-            except Exception as e:
-                leads_failed += 1
-                logger.error(f"❌ Erro ao processar {company.cnpj}: {str(e)}")
-        
         # Relatório final
         logger.info("📊 RELATÓRIO DE EXECUÇÃO:")
-        logger.info(f"   • Leads processados: {leads_processed}")
-        logger.info(f"   • Leads duplicados: {leads_duplicated}")
-        logger.info(f"   • Leads com falha: {leads_failed}")
+        logger.info("   • Leads processados: %s", stats['processed'])
+        logger.info("   • Leads duplicados: %s", stats['duplicated'])
+        logger.info("   • Leads com falha: %s", stats['failed'])
         logger.info("✅ Automação concluída com sucesso!")
         
     except Exception as e:
-        logger.error(f"💥 Erro crítico na automação: {str(e)}")
+        logger.error("💥 Erro crítico na automação: %s", e)
         sys.exit(1)
+    
+    finally:
+        # Pool de conexões compartilhado por CRM e G-Click
+        await shutdown_http()
+        # Fechar a conexão SQLite faz o checkpoint do WAL e remove os arquivos -wal/-shm
+        if db is not None:
+            db.db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
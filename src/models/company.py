@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
+from ..utils.validators import only_digits
 
-@dataclass
+@dataclass(slots=True)
 class Company:
     """Modelo para dados da empresa"""
     cnpj: str
@@ -25,7 +26,7 @@ class Company:
     @staticmethod
     def clean_cnpj(cnpj: str) -> str:
         """Remove formatação do CNPJ"""
-        return ''.join(filter(str.isdigit, cnpj))
+        return only_digits(cnpj)
     
     @property
     def formatted_cnpj(self) -> str:
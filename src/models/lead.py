@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 from .company import Company
 
-@dataclass
+@dataclass(slots=True)
 class Lead:
     """Modelo para dados do lead processado"""
     id: Optional[int]
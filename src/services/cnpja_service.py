@@ -1,13 +1,21 @@
 import aiohttp
 import asyncio
+import orjson
+from multidict import CIMultiDict, CIMultiDictProxy
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from ..models.company import Company
+from ..utils.http_retry import retry_delay
 from ..utils.logger import setup_logger
 from ..utils.validators import validate_cnpj, validate_email
 
 logger = setup_logger()
 
+def _clean_str(data: Dict, key: str) -> Optional[str]:
+    """Retorna o valor de texto sem espaços nas bordas, ou None se vazio/ausente"""
+    value = data.get(key)
+    return (value.strip() or None) if isinstance(value, str) else None
+
 class CNPJAService:
     """Serviço para integração com a API do CNPJá"""
     
@@ -17,57 +25,139 @@ class CNPJAService:
         self.token = self.config['token']
         self.timeout = self.config.get('timeout', 30)
         
-        # Headers padrão
-        self.headers = {
+        # Timeouts criados uma única vez (sessão e health check)
+        self._client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self._health_timeout = aiohttp.ClientTimeout(total=10)
+        
+        # Headers padrão (multidict case-insensitive, montado uma única vez)
+        self.headers = CIMultiDictProxy(CIMultiDict({
             'Authorization': f'{self.token}',
             'Content-Type': 'application/json',
             'User-Agent': 'Ikasa-Leads-Automation/1.0'
-        }
+        }))
+        
+        # Sessão HTTP compartilhada, criada sob demanda em _get_session
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+    
+    async def __aenter__(self) -> 'CNPJAService':
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """Fecha a sessão HTTP"""
+        if self._session:
+            await self._session.close()
+            self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Retorna a sessão HTTP reutilizada por todas as chamadas do serviço"""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                # Outra corrotina pode ter criado a sessão enquanto esperávamos
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(
+                        timeout=self._client_timeout,
+                        connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300, keepalive_timeout=60),
+                        headers=self.headers
+                    )
+        return self._session
     
     async def get_companies_by_date(self, date: str) -> List[Company]:
-        """Busca empresas criadas em uma data específica"""
-        logger.info(f"Buscando empresas no CNPJá para data: {date}")
+        """Busca empresas criadas em uma data específica (todas as páginas)"""
+        return [company async for company in self.iter_companies(date)]
+    
+    async def iter_companies(self, date: str) -> AsyncIterator[Company]:
+        """Itera sobre as empresas criadas em uma data, página a página"""
+        async for companies in self.iter_pages(date):
+            for company in companies:
+                yield company
+    
+    async def iter_pages(self, date: str) -> AsyncIterator[List[Company]]:
+        """
+        Busca empresas criadas em uma data, entregando cada página assim que chega
+        
+        A paginação segue o cursor 'next' retornado pela API; sem cursor
+        (ou sem registros) a busca termina.
+        """
+        logger.info("Buscando empresas no CNPJá para data: %s", date)
+        
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        
+        # Parâmetros para buscar empresas por data de abertura
+        params = {
+            'founded.gte': date,
+            'address.state.in': 'MA',
+            'founded.lte': current_date,
+            'limit': self.config.get('page_size', 10)
+        }
+        
+        total = 0
+        while True:
+            data = await self._fetch_page(params)
+            records = data.get('records', [])
+            
+            companies = self._parse_companies(records)
+            total += len(companies)
+            yield companies
+            
+            next_token = data.get('next')
+            if not next_token or not records:
+                break
+            params = {**params, 'token': next_token}
+        
+        logger.info("✅ %s empresas encontradas no CNPJá", total)
+    
+    async def _fetch_page(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Busca uma página de empresas no endpoint /office"""
+        max_retries = self.config.get('max_retries', 5)
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                current_date = datetime.now().strftime("%Y-%m-%d")
-                
-                # Endpoint para buscar empresas por data de abertura
-                url = f"{self.base_url}/office"
-                params = {
-                    'founded.gte': date,
-                    'address.state.in': 'MA',
-                    'founded.lte': current_date,
-                    'limit': 10
-                }
-                
-                async with session.get(url, headers=self.headers, params=params) as response:
+            session = await self._get_session()
+            url = f"{self.base_url}/office"
+            
+            for attempt in range(max_retries):
+                async with session.get(url, params=params) as response:
                     if response.status == 200:
-                        data = await response.json()
-                        companies = self._parse_companies(data.get('records', []))
-                        logger.info(f"✅ {len(companies)} empresas encontradas no CNPJá")
-                        return companies
+                        return orjson.loads(await response.read())
                     
                     elif response.status == 401:
                         logger.error("❌ Token CNPJá inválido ou expirado")
                         raise Exception("Token CNPJá inválido")
                     
                     elif response.status == 429:
-                        logger.warning("⚠️  Rate limit atingido, aguardando...")
-                        await asyncio.sleep(60)  # Aguardar 1 minuto
-                        return await self.get_companies_by_date(date)  # Retry
+                        # Retry-After ou backoff exponencial (máx. 10 min)
+                        retry_after = response.headers.get('Retry-After')
+                        delay = retry_delay(retry_after, attempt,
+                                            base_delay=self.config.get('default_backoff', 60), max_delay=600,
+                                            max_retry_after=self.config.get('max_retry_after', 600))
+                        if delay is None:
+                            logger.error("❌ CNPJá pediu Retry-After acima do limite: %s", retry_after)
+                            raise Exception(f"Rate limit CNPJá: Retry-After acima do limite ({retry_after})")
+                        
+                        logger.warning("⚠️  Rate limit atingido, aguardando %ss (tentativa %s/%s)...",
+                                       delay, attempt + 1, max_retries)
                     
                     else:
                         error_text = await response.text()
-                        logger.error(f"❌ Erro na API CNPJá: {response.status} - {error_text}")
+                        logger.error("❌ Erro na API CNPJá: %s - %s", response.status, error_text)
                         raise Exception(f"Erro na API CNPJá: {response.status}")
+                
+                # Aguardar fora do bloco da resposta para liberar a conexão
+                if attempt + 1 < max_retries:
+                    await asyncio.sleep(delay)
+            
+            raise Exception(f"Rate limit CNPJá persistente após {max_retries} tentativas")
         
         except aiohttp.ClientError as e:
-            logger.error(f"❌ Erro de conexão com CNPJá: {e}")
+            logger.error("❌ Erro de conexão com CNPJá: %s", e)
             raise Exception(f"Erro de conexão: {e}")
         
         except Exception as e:
-            logger.error(f"❌ Erro inesperado no CNPJá: {e}")
+            logger.error("❌ Erro inesperado no CNPJá: %s", e)
             raise
     
     def _parse_companies(self, companies_data: List[Dict]) -> List[Company]:
@@ -77,17 +167,17 @@ class CNPJAService:
         for data in companies_data:
             try:
                 # Validar CNPJ
-                cnpj = data.get('taxId', '').strip()
+                cnpj = _clean_str(data, 'taxId') or ''
                 if not validate_cnpj(cnpj):
-                    logger.warning(f"⚠️  CNPJ inválido ignorado: {cnpj}")
+                    logger.warning("⚠️  CNPJ inválido ignorado: %s", cnpj)
                     continue
 
                 company_data = data.get('company', {})
                 
                 # Validar campos obrigatórios
-                razao_social = company_data.get('name', '').strip()
+                razao_social = _clean_str(company_data, 'name')
                 if not razao_social:
-                    logger.warning(f"⚠️  Empresa sem razão social ignorada: {cnpj}")
+                    logger.warning("⚠️  Empresa sem razão social ignorada: %s", cnpj)
                     continue
                 
                 # Converter data de abertura
@@ -95,19 +185,21 @@ class CNPJAService:
                 try:
                     data_abertura = datetime.fromisoformat(data_abertura_str.replace('Z', '+00:00'))
                 except (ValueError, AttributeError):
-                    logger.warning(f"⚠️  Data de abertura inválida para {cnpj}: {data_abertura_str}")
+                    logger.warning("⚠️  Data de abertura inválida para %s: %s", cnpj, data_abertura_str)
                     continue
                 
                 emails = data.get('emails', [])
                 # Validar e limpar email
-                email = emails[0].get('address', '').strip().lower() if emails else None
+                email = _clean_str(emails[0], 'address') if emails else None
+                if email:
+                    email = email.lower()
                 if email and not validate_email(email):
-                    logger.debug(f"E-mail inválido para {cnpj}: {email}")
+                    logger.debug("E-mail inválido para %s: %s", cnpj, email)
                     email = None
                 
                 phones = data.get('phones', [])
                 # Validar e limpar telefone
-                phone = f"+55 {phones[0].get('area', '').strip()} {phones[0].get('number', '').strip()}" if phones else None
+                phone = f"+55 {_clean_str(phones[0], 'area') or ''} {_clean_str(phones[0], 'number') or ''}" if phones else None
 
                 address = data.get('address', {})
                 main_activity = data.get('mainActivity', {})
@@ -116,23 +208,23 @@ class CNPJAService:
                 company = Company(
                     cnpj=cnpj,
                     razao_social=razao_social,
-                    nome_fantasia=data.get('nome_fantasia', '').strip() or None,
+                    nome_fantasia=_clean_str(data, 'nome_fantasia'),
                     email=email,
                     telefone=phone,
                     endereco=self._format_address(address),
-                    cidade=address.get('city', '').strip(),
-                    estado=address.get('state', '').strip(),
-                    cep=address.get('zip', '').strip() or None,
+                    cidade=_clean_str(address, 'city') or '',
+                    estado=_clean_str(address, 'state') or '',
+                    cep=_clean_str(address, 'zip'),
                     data_abertura=data_abertura,
-                    atividade_principal=main_activity.get('text', '').strip() or None,
-                    situacao=data.get('situacao', 'ATIVA').strip()
+                    atividade_principal=_clean_str(main_activity, 'text'),
+                    situacao=_clean_str(data, 'situacao') or 'ATIVA'
                 )
                 
                 companies.append(company)
-                logger.debug(f"✅ Empresa processada: {company.razao_social} ({company.cnpj})")
+                logger.debug("✅ Empresa processada: %s (%s)", company.razao_social, company.cnpj)
                 
             except Exception as e:
-                logger.error(f"❌ Erro ao processar empresa: {e}")
+                logger.error("❌ Erro ao processar empresa: %s", e)
                 continue
         
         return companies
@@ -141,56 +233,60 @@ class CNPJAService:
         """Formata endereço completo"""
         parts = []
         
-        if data.get('street'):
-            parts.append(data['street'].strip())
+        street = _clean_str(data, 'street')
+        if street:
+            parts.append(street)
         
-        if data.get('number'):
-            parts.append(f"nº {data['number'].strip()}")
+        number = _clean_str(data, 'number')
+        if number:
+            parts.append(f"nº {number}")
         
-        if data.get('details'):
-            parts.append(data['details'].strip())
+        details = _clean_str(data, 'details')
+        if details:
+            parts.append(details)
         
-        if data.get('district'):
-            parts.append(data['district'].strip())
+        district = _clean_str(data, 'district')
+        if district:
+            parts.append(district)
         
         return ', '.join(parts) if parts else None
     
     async def get_company_details(self, cnpj: str) -> Optional[Dict[str, Any]]:
         """Busca detalhes completos de uma empresa específica"""
-        logger.debug(f"Buscando detalhes da empresa: {cnpj}")
+        logger.debug("Buscando detalhes da empresa: %s", cnpj)
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                url = f"{self.base_url}/empresas/{cnpj}"
+            session = await self._get_session()
+            url = f"{self.base_url}/empresas/{cnpj}"
+            
+            async with session.get(url) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    logger.debug("✅ Detalhes obtidos para: %s", cnpj)
+                    return data
                 
-                async with session.get(url, headers=self.headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logger.debug(f"✅ Detalhes obtidos para: {cnpj}")
-                        return data
-                    
-                    elif response.status == 404:
-                        logger.warning(f"⚠️  Empresa não encontrada: {cnpj}")
-                        return None
-                    
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Erro ao buscar detalhes: {response.status} - {error_text}")
-                        return None
+                elif response.status == 404:
+                    logger.warning("⚠️  Empresa não encontrada: %s", cnpj)
+                    return None
+                
+                else:
+                    error_text = await response.text()
+                    logger.error("❌ Erro ao buscar detalhes: %s - %s", response.status, error_text)
+                    return None
         
         except Exception as e:
-            logger.error(f"❌ Erro ao buscar detalhes da empresa {cnpj}: {e}")
+            logger.error("❌ Erro ao buscar detalhes da empresa %s: %s", cnpj, e)
             return None
     
     async def health_check(self) -> bool:
         """Verifica se a API está funcionando"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                url = f"{self.base_url}/health"
-                
-                async with session.get(url, headers=self.headers) as response:
-                    return response.status == 200
+            session = await self._get_session()
+            url = f"{self.base_url}/health"
+            
+            async with session.get(url, timeout=self._health_timeout) as response:
+                return response.status == 200
         
         except Exception as e:
-            logger.error(f"❌ Health check CNPJá falhou: {e}")
+            logger.error("❌ Health check CNPJá falhou: %s", e)
             return False
\ No newline at end of file
@@ -1,7 +1,11 @@
 import aiohttp
 import asyncio
-from typing import Dict, Any, Optional
+import orjson
+from multidict import CIMultiDict, CIMultiDictProxy
+from typing import Dict, Any, List, Optional, Tuple
 from ..models.company import Company
+from ..utils.http import LIMIT_PER_HOST, get_shared_connector
+from ..utils.http_retry import RETRY_STATUSES, retry_request
 from ..utils.logger import setup_logger
 
 logger = setup_logger()
@@ -9,72 +13,209 @@ logger = setup_logger()
 class CRMService:
     """Serviço para integração com a API do 4C CRM"""
     
+    # Partes fixas do payload de lead, iguais para todas as empresas
+    # (a ordem das chaves no payload é a mesma do formato original)
+    _STATIC_LEAD_DATA: Dict[str, Any] = {
+        'source': 'CNPJá Automation',
+        'status': 'new',
+        'priority': 'medium'
+    }
+    # Tupla para que nenhum payload altere as tags dos demais (orjson a serializa como array)
+    _STATIC_TAGS: Tuple[str, ...] = ('automacao', 'cnpja', 'empresa-nova')
+    _STATIC_CUSTOM_FIELDS: Dict[str, Any] = {
+        'fonte_captacao': 'CNPJá API',
+        'segmento': 'Contábil'
+    }
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config['apis']['crm_4c']
         self.base_url = self.config['base_url']
         self.api_key = self.config['api_key']
         self.timeout = self.config.get('timeout', 30)
         
-        # Headers padrão
-        self.headers = {
+        # Timeouts criados uma única vez (sessão e health check)
+        self._client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self._health_timeout = aiohttp.ClientTimeout(total=10)
+        # POST /leads/bulk só é usado se a conta do CRM oferecer o endpoint
+        self.supports_bulk = self.config.get('supports_bulk', False)
+        
+        # Headers padrão (multidict case-insensitive, montado uma única vez)
+        self.headers = CIMultiDictProxy(CIMultiDict({
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json',
             'User-Agent': 'Ikasa-Leads-Automation/1.0'
-        }
+        }))
+        
+        # Sessão HTTP compartilhada, criada sob demanda em _get_session
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+        
+        # Limite de requisições simultâneas, nunca acima do limit_per_host do pool compartilhado
+        self._sem = asyncio.Semaphore(min(self.config.get('max_concurrency', 20), LIMIT_PER_HOST))
+    
+    async def __aenter__(self) -> 'CRMService':
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """Fecha a sessão HTTP"""
+        if self._session:
+            await self._session.close()
+            self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Retorna a sessão HTTP reutilizada por todas as chamadas do serviço"""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                # Outra corrotina pode ter criado a sessão enquanto esperávamos
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(
+                        timeout=self._client_timeout,
+                        connector=await get_shared_connector(),
+                        connector_owner=False,
+                        headers=self.headers
+                    )
+        return self._session
     
     async def create_lead(self, company: Company) -> Optional[str]:
         """Cria um lead no CRM"""
-        logger.info(f"Criando lead no CRM: {company.razao_social}")
+        logger.info("Criando lead no CRM: %s", company.razao_social)
         
         try:
-            # Preparar dados do lead
-            lead_data = self._prepare_lead_data(company)
+            # Preparar dados do lead (serializados uma vez com orjson)
+            payload = orjson.dumps(self._prepare_lead_data(company))
+            
+            session = await self._get_session()
+            url = f"{self.base_url}/leads"
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                url = f"{self.base_url}/leads"
+            async with self._sem, retry_request(lambda: session.post(url, data=payload), 'CRM',
+                                                max_attempts=self.config.get('max_retries', 5),
+                                                base_delay=self.config.get('default_backoff', 30),
+                                                max_delay=600,
+                                                max_retry_after=self.config.get('max_retry_after', 600)) as response:
+                if response.status == 201:
+                    data = orjson.loads(await response.read())
+                    lead_id = data.get('id') or data.get('lead_id')
+                    logger.info("✅ Lead criado no CRM: %s", lead_id)
+                    return str(lead_id)
                 
-                async with session.post(url, headers=self.headers, json=lead_data) as response:
-                    if response.status == 201:
-                        data = await response.json()
-                        lead_id = data.get('id') or data.get('lead_id')
-                        logger.info(f"✅ Lead criado no CRM: {lead_id}")
-                        return str(lead_id)
-                    
-                    elif response.status == 409:
-                        # Lead já existe
-                        logger.warning(f"⚠️  Lead já existe no CRM: {company.cnpj}")
-                        data = await response.json()
-                        existing_id = data.get('existing_id')
-                        return str(existing_id) if existing_id else None
-                    
-                    elif response.status == 401:
-                        logger.error("❌ API Key do CRM inválida")
-                        raise Exception("API Key do CRM inválida")
-                    
-                    elif response.status == 429:
-                        logger.warning("⚠️  Rate limit CRM atingido, aguardando...")
-                        await asyncio.sleep(30)
-                        return await self.create_lead(company)  # Retry
-                    
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Erro na API CRM: {response.status} - {error_text}")
-                        raise Exception(f"Erro na API CRM: {response.status}")
+                elif response.status == 409:
+                    # Lead já existe
+                    logger.warning("⚠️  Lead já existe no CRM: %s", company.cnpj)
+                    data = orjson.loads(await response.read())
+                    existing_id = data.get('existing_id')
+                    return str(existing_id) if existing_id else None
+                
+                elif response.status == 401:
+                    logger.error("❌ API Key do CRM inválida")
+                    raise Exception("API Key do CRM inválida")
+                
+                elif response.status in RETRY_STATUSES:
+                    logger.error("❌ Rate limit CRM persistente: %s", response.status)
+                    raise Exception(f"Rate limit CRM persistente: {response.status}")
+                
+                else:
+                    error_text = await response.text()
+                    logger.error("❌ Erro na API CRM: %s - %s", response.status, error_text)
+                    raise Exception(f"Erro na API CRM: {response.status}")
         
         except aiohttp.ClientError as e:
-            logger.error(f"❌ Erro de conexão com CRM: {e}")
+            logger.error("❌ Erro de conexão com CRM: %s", e)
             raise Exception(f"Erro de conexão CRM: {e}")
         
         except Exception as e:
-            logger.error(f"❌ Erro inesperado no CRM: {e}")
+            logger.error("❌ Erro inesperado no CRM: %s", e)
             raise
     
+    async def create_leads_bulk(self, companies: List[Company]) -> List[Optional[str]]:
+        """
+        Cria vários leads no CRM em uma única requisição (POST /leads/bulk)
+        
+        Args:
+            companies: Empresas a cadastrar
+            
+        Returns:
+            IDs dos leads na mesma ordem das empresas; None para itens recusados ou sem resultado
+        """
+        logger.info("Criando %s leads em lote no CRM", len(companies))
+        
+        try:
+            # Serializado uma vez, reaproveitado nas novas tentativas
+            payload = orjson.dumps([self._prepare_lead_data(company) for company in companies])
+            
+            session = await self._get_session()
+            url = f"{self.base_url}/leads/bulk"
+            
+            async with self._sem, retry_request(lambda: session.post(url, data=payload), 'CRM',
+                                                max_attempts=self.config.get('max_retries', 5),
+                                                base_delay=self.config.get('default_backoff', 30),
+                                                max_delay=600,
+                                                max_retry_after=self.config.get('max_retry_after', 600)) as response:
+                if response.status in (200, 201, 207):
+                    results = orjson.loads(await response.read()).get('results', [])
+                    return self._match_bulk_results(companies, results)
+                
+                elif response.status == 401:
+                    logger.error("❌ API Key do CRM inválida")
+                    raise Exception("API Key do CRM inválida")
+                
+                else:
+                    error_text = await response.text()
+                    logger.error("❌ Erro na API CRM (lote): %s - %s", response.status, error_text)
+                    raise Exception(f"Erro na API CRM (lote): {response.status}")
+        
+        except aiohttp.ClientError as e:
+            logger.error("❌ Erro de conexão com CRM: %s", e)
+            raise Exception(f"Erro de conexão CRM: {e}")
+    
+    def _match_bulk_results(self, companies: List[Company],
+                            results: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Associa os resultados do POST /leads/bulk às empresas enviadas
+        
+        Itens com CNPJ são associados pelo CNPJ; sem ele, pela posição, mas
+        só se o CRM devolveu um resultado por empresa. Empresas sem resultado
+        ficam com None e são cadastradas individualmente pelo chamador.
+        """
+        if len(results) != len(companies):
+            logger.warning("⚠️  CRM devolveu %s resultados para um lote de %s leads",
+                           len(results), len(companies))
+        
+        index_by_cnpj = {company.cnpj: index for index, company in enumerate(companies)}
+        lead_ids: List[Optional[str]] = [None] * len(companies)
+        
+        for position, item in enumerate(results):
+            if item.get('cnpj'):
+                index = index_by_cnpj.get(Company.clean_cnpj(str(item['cnpj'])))
+                if index is None:
+                    logger.warning("⚠️  Resultado do lote do CRM para CNPJ não enviado: %s", item['cnpj'])
+                    continue
+            elif len(results) == len(companies):
+                index = position
+            else:
+                # Sem CNPJ e com contagem divergente não há como saber a que empresa pertence
+                logger.warning("⚠️  Resultado sem CNPJ ignorado no lote do CRM (posição %s)", position)
+                continue
+            
+            # Lead já existente volta com existing_id, como no 409 individual
+            lead_id = item.get('id') or item.get('lead_id') or item.get('existing_id')
+            if lead_id:
+                lead_ids[index] = str(lead_id)
+            else:
+                logger.warning("⚠️  Lead recusado no lote do CRM: %s - %s",
+                               companies[index].cnpj, item.get('error'))
+        
+        logger.info("✅ %s de %s leads criados em lote no CRM",
+                    len(companies) - lead_ids.count(None), len(companies))
+        return lead_ids
+    
     def _prepare_lead_data(self, company: Company) -> Dict[str, Any]:
         """Prepara dados da empresa para o formato do CRM"""
         return {
-            'source': 'CNPJá Automation',
-            'status': 'new',
-            'priority': 'medium',
+            **self._STATIC_LEAD_DATA,
             'company': {
                 'cnpj': company.formatted_cnpj,
                 'name': company.razao_social,
@@ -89,60 +230,59 @@ class CRMService:
                 'main_activity': company.atividade_principal,
                 'status': company.situacao
             },
-            'tags': ['automacao', 'cnpja', 'empresa-nova'],
+            'tags': self._STATIC_TAGS,
             'custom_fields': {
-                'data_captacao': company.data_abertura.strftime('%Y-%m-%d'),
-                'fonte_captacao': 'CNPJá API',
-                'segmento': 'Contábil'
+                'data_captacao': company.data_abertura.date().isoformat(),
+                **self._STATIC_CUSTOM_FIELDS
             }
         }
     
     async def update_lead(self, lead_id: str, data: Dict[str, Any]) -> bool:
         """Atualiza um lead existente"""
-        logger.info(f"Atualizando lead no CRM: {lead_id}")
+        logger.info("Atualizando lead no CRM: %s", lead_id)
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                url = f"{self.base_url}/leads/{lead_id}"
-                
-                async with session.put(url, headers=self.headers, json=data) as response:
-                    if response.status == 200:
-                        logger.info(f"✅ Lead atualizado no CRM: {lead_id}")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Erro ao atualizar lead: {response.status} - {error_text}")
-                        return False
+            session = await self._get_session()
+            url = f"{self.base_url}/leads/{lead_id}"
+            
+            async with self._sem, session.put(url, data=orjson.dumps(data)) as response:
+                if response.status == 200:
+                    logger.info("✅ Lead atualizado no CRM: %s", lead_id)
+                    return True
+                else:
+                    error_text = await response.text()
+                    logger.error("❌ Erro ao atualizar lead: %s - %s", response.status, error_text)
+                    return False
         
         except Exception as e:
-            logger.error(f"❌ Erro ao atualizar lead {lead_id}: {e}")
+            logger.error("❌ Erro ao atualizar lead %s: %s", lead_id, e)
             return False
     
     async def get_lead(self, lead_id: str) -> Optional[Dict[str, Any]]:
         """Busca um lead específico"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                url = f"{self.base_url}/leads/{lead_id}"
-                
-                async with session.get(url, headers=self.headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        return None
+            session = await self._get_session()
+            url = f"{self.base_url}/leads/{lead_id}"
+            
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return orjson.loads(await response.read())
+                else:
+                    return None
         
         except Exception as e:
-            logger.error(f"❌ Erro ao buscar lead {lead_id}: {e}")
+            logger.error("❌ Erro ao buscar lead %s: %s", lead_id, e)
             return None
     
     async def health_check(self) -> bool:
         """Verifica se a API está funcionando"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                url = f"{self.base_url}/health"
-                
-                async with session.get(url, headers=self.headers) as response:
-                    return response.status == 200
+            session = await self._get_session()
+            url = f"{self.base_url}/health"
+            
+            async with session.get(url, timeout=self._health_timeout) as response:
+                return response.status == 200
         
         except Exception as e:
-            logger.error(f"❌ Health check CRM falhou: {e}")
+            logger.error("❌ Health check CRM falhou: %s", e)
             return False
\ No newline at end of file
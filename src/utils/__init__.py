@@ -2,6 +2,6 @@
 
 from .config import load_config
 from .logger import setup_logger
-from .validators import validate_cnpj, validate_email
+from .validators import validate_cnpj, validate_cnpj_batch, validate_email
 
-__all__ = ['load_config', 'setup_logger', 'validate_cnpj', 'validate_email']
\ No newline at end of file
+__all__ = ['load_config', 'setup_logger', 'validate_cnpj', 'validate_cnpj_batch', 'validate_email']
\ No newline at end of file
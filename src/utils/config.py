@@ -1,13 +1,30 @@
 import yaml
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any
 import re
 
+try:
+    # Loader em C (libyaml), quando o PyYAML foi compilado com ele
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Variáveis de ambiente no formato ${VAR_NAME}
+_ENV_VAR_RE = re.compile(r'\$\{([^}]+)\}')
+
+# Raiz do projeto (três níveis acima de src/utils/config.py)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+@lru_cache(maxsize=None)
 def load_config(config_path: str = None) -> Dict[str, Any]:
     """
     Carrega configurações do arquivo YAML
     
+    O resultado é cacheado por caminho: o arquivo é lido uma única vez por
+    processo e todos os chamadores recebem o mesmo dict (não o modifique).
+    
     Args:
         config_path: Caminho para o arquivo de configuração
         
@@ -16,8 +33,7 @@ def load_config(config_path: str = None) -> Dict[str, Any]:
     """
     if config_path is None:
         # Buscar arquivo de configuração na raiz do projeto
-        project_root = Path(__file__).parent.parent.parent
-        config_path = project_root / "config" / "settings.yaml"
+        config_path = PROJECT_ROOT / "config" / "settings.yaml"
     
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Arquivo de configuração não encontrado: {config_path}")
@@ -26,7 +42,7 @@ def load_config(config_path: str = None) -> Dict[str, Any]:
         content = file.read()
         # Substituir variáveis de ambiente no formato ${VAR_NAME}
         content = replace_env_vars(content)
-        config = yaml.safe_load(content)
+        config = yaml.load(content, Loader=_YamlLoader)
     
     # Validar configurações obrigatórias
     required_sections = ['apis', 'database', 'logging']
@@ -47,9 +63,7 @@ def replace_env_vars(content: str) -> str:
         # Se não encontrou, mantém o valor original
         return match.group(0)
     
-    # Pattern para encontrar ${VAR_NAME}
-    pattern = r'\$\{([^}]+)\}'
-    return re.sub(pattern, replace_var, content)
+    return _ENV_VAR_RE.sub(replace_var, content)
 
 def get_database_path() -> str:
     """Retorna o caminho completo para o banco de dados"""
@@ -58,8 +72,7 @@ def get_database_path() -> str:
     
     # Se for caminho relativo, tornar absoluto baseado na raiz do projeto
     if not os.path.isabs(db_path):
-        project_root = Path(__file__).parent.parent.parent
-        db_path = project_root / db_path
+        db_path = PROJECT_ROOT / db_path
     
     # Criar diretório se não existir
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -0,0 +1,46 @@
+"""Pool de conexões HTTP compartilhado pelos serviços"""
+
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+# Conexões simultâneas por host; o semáforo de cada serviço é limitado a este valor
+LIMIT_PER_HOST = 30
+
+_connector: Optional[aiohttp.TCPConnector] = None
+
+
+async def get_shared_connector() -> aiohttp.TCPConnector:
+    """
+    Retorna o TCPConnector do event loop atual, criando-o na primeira chamada
+
+    O connector pertence ao loop em que foi criado; se o loop mudou (por
+    exemplo, dois asyncio.run no mesmo processo ou um loop por teste), o
+    anterior é fechado e um novo é criado para o loop atual.
+    As sessões que o usam devem ser criadas com connector_owner=False,
+    para que fechar uma sessão não feche o pool das demais.
+    """
+    global _connector
+    loop = asyncio.get_running_loop()
+    if _connector is not None and not _connector.closed and _connector._loop is not loop:
+        # Com o loop antigo já encerrado, close() apenas marca o connector como fechado
+        stale, _connector = _connector, None
+        await stale.close()
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=LIMIT_PER_HOST,
+            ttl_dns_cache=600,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True
+        )
+    return _connector
+
+
+async def shutdown_http():
+    """Fecha o pool compartilhado (chamar ao encerrar a aplicação)"""
+    global _connector
+    if _connector is not None:
+        await _connector.close()
+        _connector = None
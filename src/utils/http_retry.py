@@ -0,0 +1,108 @@
+"""Novas tentativas para chamadas HTTP com rate limit"""
+
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AbstractSet, AsyncIterator, Awaitable, Callable, Optional
+
+import aiohttp
+
+from .logger import setup_logger
+
+logger = setup_logger()
+
+# Status que indicam sobrecarga temporária do servidor
+RETRY_STATUSES = frozenset({429, 503})
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """
+    Interpreta o header Retry-After (RFC 9110: delay-seconds ou HTTP-date)
+
+    delay-seconds aceita apenas dígitos ASCII, então valores como 'inf',
+    'nan', '1e9' ou '-5' são tratados como inválidos.
+
+    Returns:
+        Segundos a aguardar, ou None se o header estiver ausente ou inválido
+    """
+    if not retry_after:
+        return None
+    retry_after = retry_after.strip()
+    if retry_after.isascii() and retry_after.isdigit():
+        return float(int(retry_after))
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def retry_delay(retry_after: Optional[str], attempt: int,
+                base_delay: float = 1.0, max_delay: float = 60.0,
+                max_retry_after: float = 600.0) -> Optional[float]:
+    """
+    Calcula a espera antes da próxima tentativa
+
+    O Retry-After do servidor é respeitado até max_retry_after; acima disso
+    não vale a pena aguardar e a tentativa deve ser dada como falha.
+    max_delay limita o backoff exponencial usado quando o header não vem.
+
+    Args:
+        retry_after: Valor do header Retry-After, se houver
+        attempt: Tentativa atual, começando em 0
+        base_delay: Base do backoff exponencial
+        max_delay: Espera máxima do backoff em segundos
+        max_retry_after: Maior Retry-After aceito, em segundos
+
+    Returns:
+        Segundos a aguardar, ou None se o servidor pediu mais que max_retry_after
+    """
+    delay = parse_retry_after(retry_after)
+    if delay is not None:
+        return delay if delay <= max_retry_after else None
+    return min(base_delay * 2 ** attempt + random.uniform(0, 1), max_delay)
+
+
+@asynccontextmanager
+async def retry_request(send: Callable[[], Awaitable[aiohttp.ClientResponse]],
+                        service: str,
+                        on_status: AbstractSet[int] = RETRY_STATUSES,
+                        max_attempts: int = 5,
+                        base_delay: float = 1.0,
+                        max_delay: float = 60.0,
+                        max_retry_after: float = 600.0) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Executa a requisição repetindo-a enquanto o status estiver em on_status
+
+    Uso: async with retry_request(lambda: session.post(url, data=payload), 'CRM') as response
+
+    A última resposta é entregue ao chamador mesmo que ainda seja um status
+    de retry, para que ele decida como tratar o esgotamento das tentativas.
+    O mesmo acontece, sem aguardar, se o Retry-After exceder max_retry_after.
+    """
+    for attempt in range(max_attempts):
+        response = await send()
+        if response.status not in on_status or attempt + 1 >= max_attempts:
+            break
+
+        retry_after = response.headers.get('Retry-After')
+        delay = retry_delay(retry_after, attempt, base_delay, max_delay, max_retry_after)
+        if delay is None:
+            logger.warning("⚠️  %s pediu Retry-After de %s, acima do limite de %ss; desistindo",
+                           service, retry_after, max_retry_after)
+            break
+
+        # Liberar a conexão antes de aguardar
+        response.release()
+        logger.warning("⚠️  %s respondeu %s, nova tentativa em %.1fs (%s/%s)...",
+                       service, response.status, delay, attempt + 1, max_attempts)
+        await asyncio.sleep(delay)
+
+    try:
+        yield response
+    finally:
+        response.release()
@@ -1,13 +1,22 @@
+import atexit
 import logging
 import os
-from pathlib import Path
-from logging.handlers import RotatingFileHandler
-from .config import load_config
+import queue
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from .config import PROJECT_ROOT, load_config
 
+@lru_cache(maxsize=None)
 def setup_logger(name: str = "leads_automation") -> logging.Logger:
     """
     Configura e retorna o logger do sistema
     
+    Os handlers são instalados apenas na primeira chamada para cada nome;
+    as seguintes devolvem o mesmo logger já configurado.
+    
+    O logger só enfileira os registros; a escrita em arquivo e console é
+    feita por um QueueListener em thread própria, fora do event loop.
+    
     Args:
         name: Nome do logger
         
@@ -20,8 +29,7 @@ def setup_logger(name: str = "leads_automation") -> logging.Logger:
     # Criar diretório de logs se não existir
     log_file = log_config['file']
     if not os.path.isabs(log_file):
-        project_root = Path(__file__).parent.parent.parent
-        log_file = project_root / log_file
+        log_file = PROJECT_ROOT / log_file
     
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
     
@@ -53,7 +61,12 @@ def setup_logger(name: str = "leads_automation") -> logging.Logger:
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Escrita em background: o logger apenas enfileira
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger.addHandler(QueueHandler(log_queue))
     
     return logger
\ No newline at end of file
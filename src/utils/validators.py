@@ -1,5 +1,54 @@
 import re
-from typing import Optional
+from functools import lru_cache
+from operator import mul
+from typing import List, Optional
+
+# Tabela de deleção para str.translate: remove tudo em Latin-1 exceto 0-9
+_NON_DIGIT_TABLE = str.maketrans('', '', ''.join(chr(c) for c in range(256) if chr(c) not in '0123456789'))
+_NON_ASCII_DIGIT_RE = re.compile(r'[^0-9]+')
+
+# Padrões compilados uma única vez (usados com fullmatch)
+_CNPJ_RE = re.compile(r'[0-9]{14}')
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+# Pesos dos dígitos verificadores do CNPJ
+_CNPJ_WEIGHTS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_WEIGHTS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Converte os bytes ASCII '0'-'9' nos valores 0-9 (bytes.translate)
+_ASCII_TO_DIGIT = bytes.maketrans(b'0123456789', bytes(range(10)))
+
+@lru_cache(maxsize=None)
+def _numpy_weights():
+    """
+    Importa o numpy e monta os pesos como arrays na primeira validação em lote
+    
+    O import fica fora do nível do módulo porque Company importa este
+    módulo e não precisa pagar o custo do numpy.
+    
+    Returns:
+        (np, pesos_1, pesos_2), ou None se o numpy não estiver instalado
+    """
+    try:
+        import numpy as np
+    except ImportError:  # numpy é opcional: validate_cnpj_batch cai no laço Python
+        return None
+    return (np,
+            np.array(_CNPJ_WEIGHTS_1, dtype=np.int32),
+            np.array(_CNPJ_WEIGHTS_2, dtype=np.int32))
+
+def only_digits(value: str) -> str:
+    """
+    Mantém apenas os dígitos ASCII (0-9) de uma string
+    
+    Ao contrário de str.isdigit, descarta dígitos não ASCII (ex.: '١').
+    O caminho comum (texto Latin-1) é resolvido por str.translate em C;
+    o regex só é usado se sobrar algum caractere fora do ASCII.
+    """
+    digits = value.translate(_NON_DIGIT_TABLE)
+    if not digits.isascii():
+        digits = _NON_ASCII_DIGIT_RE.sub('', digits)
+    return digits
 
 def validate_cnpj(cnpj: str) -> bool:
     """
@@ -11,33 +60,74 @@ def validate_cnpj(cnpj: str) -> bool:
     Returns:
         True se válido, False caso contrário
     """
-    # Remove formatação
-    cnpj = ''.join(filter(str.isdigit, cnpj))
-    
-    # Verifica se tem 14 dígitos
-    if len(cnpj) != 14:
-        return False
+    # CNPJ já limpo (caso comum vindo da API) dispensa a remoção de formatação
+    if not _CNPJ_RE.fullmatch(cnpj):
+        cnpj = only_digits(cnpj)
+        
+        # Verifica se tem 14 dígitos
+        if len(cnpj) != 14:
+            return False
     
     # Verifica se todos os dígitos são iguais
     if cnpj == cnpj[0] * 14:
         return False
     
+    # Valores dos dígitos sem int() por caractere; somas via map(mul) em C
+    digits = cnpj.encode('ascii').translate(_ASCII_TO_DIGIT)
+    
     # Calcula primeiro dígito verificador
-    sequence = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    sum_digits = sum(int(cnpj[i]) * sequence[i] for i in range(12))
+    sum_digits = sum(map(mul, digits, _CNPJ_WEIGHTS_1))
     remainder = sum_digits % 11
     first_digit = 0 if remainder < 2 else 11 - remainder
     
-    if int(cnpj[12]) != first_digit:
+    if digits[12] != first_digit:
         return False
     
     # Calcula segundo dígito verificador
-    sequence = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    sum_digits = sum(int(cnpj[i]) * sequence[i] for i in range(13))
+    sum_digits = sum(map(mul, digits, _CNPJ_WEIGHTS_2))
     remainder = sum_digits % 11
     second_digit = 0 if remainder < 2 else 11 - remainder
     
-    return int(cnpj[13]) == second_digit
+    return digits[13] == second_digit
+
+def validate_cnpj_batch(cnpjs: List[str]) -> List[bool]:
+    """
+    Valida uma lista de CNPJs de uma só vez
+    
+    Com numpy disponível, os dígitos verificadores são calculados como
+    produtos matriciais sobre uma matriz (N, 14); sem ele, aplica
+    validate_cnpj a cada item.
+    
+    Args:
+        cnpjs: CNPJs para validar
+        
+    Returns:
+        Lista de booleanos na mesma ordem da entrada
+    """
+    numpy_weights = _numpy_weights()
+    if numpy_weights is None:
+        return [validate_cnpj(cnpj) for cnpj in cnpjs]
+    np, weights_1, weights_2 = numpy_weights
+    
+    cleaned = [cnpj if _CNPJ_RE.fullmatch(cnpj) else only_digits(cnpj) for cnpj in cnpjs]
+    sized = np.array([len(cnpj) == 14 for cnpj in cleaned], dtype=bool)
+    
+    # Itens com tamanho errado entram como zeros e são descartados por `sized`
+    buffer = ''.join(cnpj if len(cnpj) == 14 else '0' * 14 for cnpj in cleaned).encode('ascii')
+    digits = (np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 14) - ord('0')).astype(np.int32)
+    
+    remainder = digits[:, :12] @ weights_1 % 11
+    first_digit = np.where(remainder < 2, 0, 11 - remainder)
+    
+    remainder = digits[:, :13] @ weights_2 % 11
+    second_digit = np.where(remainder < 2, 0, 11 - remainder)
+    
+    all_equal = (digits == digits[:, :1]).all(axis=1)
+    
+    valid = (sized & ~all_equal
+             & (digits[:, 12] == first_digit)
+             & (digits[:, 13] == second_digit))
+    return valid.tolist()
 
 def validate_email(email: Optional[str]) -> bool:
     """
@@ -52,8 +142,7 @@ def validate_email(email: Optional[str]) -> bool:
     if not email:
         return False
     
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return _EMAIL_RE.fullmatch(email) is not None
 
 def clean_phone(phone: Optional[str]) -> Optional[str]:
     """
@@ -69,7 +158,7 @@ def clean_phone(phone: Optional[str]) -> Optional[str]:
         return None
     
     # Remove tudo que não é dígito
-    clean = ''.join(filter(str.isdigit, phone))
+    clean = only_digits(phone)
     
     # Verifica se tem tamanho válido (10 ou 11 dígitos)
     if len(clean) not in [10, 11]:
@@ -83,7 +172,7 @@ def clean_cep(cep: Optional[str]) -> Optional[str]:
         return None
     
     # Remove tudo que não é dígito
-    digits = ''.join(filter(str.isdigit, cep))
+    digits = only_digits(cep)
     
     if len(digits) == 8:
         return f"{digits[:5]}-{digits[5:]}"
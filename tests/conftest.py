@@ -0,0 +1,10 @@
+import pytest
+from unittest.mock import patch
+from src.database.repository import LeadRepository
+
+@pytest.fixture
+def repository(tmp_path):
+    with patch('src.database.connection.get_database_path', return_value=str(tmp_path / 'leads.db')):
+        repo = LeadRepository({})
+        yield repo
+        repo.db.close()
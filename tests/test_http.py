@@ -0,0 +1,72 @@
+import asyncio
+import warnings
+from datetime import datetime
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.models.company import Company
+from src.services.crm_service import CRMService
+from src.utils import http
+from src.utils.http import LIMIT_PER_HOST, get_shared_connector, shutdown_http
+
+def _config(base_url, **crm):
+    return {
+        'apis': {
+            'crm_4c': {'base_url': base_url, 'api_key': 'test_api_key', 'timeout': 30, **crm}
+        }
+    }
+
+def _company():
+    return Company(
+        cnpj='11222333000181',
+        razao_social='Empresa Teste LTDA',
+        nome_fantasia=None,
+        email='contato@empresateste.com.br',
+        telefone=None,
+        endereco=None,
+        cidade='São Luís',
+        estado='MA',
+        cep=None,
+        data_abertura=datetime(2024, 1, 15),
+        atividade_principal='Atividade de teste',
+        situacao='ATIVA'
+    )
+
+async def _create_lead():
+    """Cria um lead contra um servidor local, sem chamar shutdown_http"""
+    async def create(request):
+        return web.json_response({'id': 'crm-1'}, status=201)
+
+    app = web.Application()
+    app.router.add_post('/leads', create)
+    async with TestServer(app) as server:
+        async with CRMService(_config(str(server.make_url('')).rstrip('/'))) as crm:
+            return await crm.create_lead(_company()), http._connector
+
+class TestSharedConnector:
+
+    def test_new_connector_per_event_loop(self):
+        """Testa que dois asyncio.run no mesmo processo não reaproveitam o connector do loop encerrado"""
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', ResourceWarning)
+                first_id, first = asyncio.run(_create_lead())
+                second_id, second = asyncio.run(_create_lead())
+            assert first_id == second_id == 'crm-1'
+            assert second is not first
+            assert first.closed
+        finally:
+            asyncio.run(shutdown_http())
+
+    def test_same_loop_reuses_connector(self):
+        """Testa que o connector é único dentro do mesmo loop"""
+        async def run():
+            try:
+                return await get_shared_connector() is await get_shared_connector()
+            finally:
+                await shutdown_http()
+        assert asyncio.run(run())
+
+    def test_semaphore_clamped_to_limit_per_host(self):
+        """Testa que max_concurrency não ultrapassa o limit_per_host do pool"""
+        crm = CRMService(_config('http://localhost', max_concurrency=LIMIT_PER_HOST * 10))
+        assert crm._sem._value == LIMIT_PER_HOST
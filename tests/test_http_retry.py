@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import AsyncMock, Mock, patch
+from src.utils.http_retry import parse_retry_after, retry_delay, retry_request
+
+def _response(status, retry_after=None):
+    response = Mock()
+    response.status = status
+    response.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return response
+
+class TestRetryAfter:
+
+    def test_seconds(self):
+        """Testa o formato delay-seconds"""
+        assert parse_retry_after('120') == 120.0
+        assert parse_retry_after(' 0 ') == 0.0
+
+    def test_http_date(self):
+        """Testa o formato HTTP-date"""
+        future = datetime.now(timezone.utc) + timedelta(seconds=30)
+        assert 25 <= parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+        # Datas no passado não geram espera negativa
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+    def test_invalid(self):
+        """Testa que valores fora da RFC 9110 são ignorados"""
+        for value in (None, '', 'inf', 'nan', '1e9', '-5', '1.5', '١٢', 'amanhã'):
+            assert parse_retry_after(value) is None
+
+    def test_clamp(self):
+        """Testa o limite do Retry-After e do backoff"""
+        assert retry_delay('600', 0, max_retry_after=600) == 600.0
+        assert retry_delay('601', 0, max_retry_after=600) is None
+        far_future = format_datetime(datetime.now(timezone.utc) + timedelta(days=365), usegmt=True)
+        assert retry_delay(far_future, 0) is None
+        # Sem header válido usa backoff limitado a max_delay
+        assert retry_delay('inf', 10, max_delay=60) == 60.0
+        assert 1.0 <= retry_delay(None, 0) <= 2.0
+
+class TestRetryRequest:
+
+    @pytest.mark.asyncio
+    async def test_retries_until_success(self):
+        """Testa que 429/503 são repetidos respeitando o Retry-After"""
+        send = AsyncMock(side_effect=[_response(429, '2'), _response(503), _response(201)])
+        with patch('src.utils.http_retry.asyncio.sleep', new=AsyncMock()) as sleep:
+            async with retry_request(send, 'CRM') as response:
+                assert response.status == 201
+        assert send.await_count == 3
+        assert sleep.await_args_list[0].args == (2.0,)
+
+    @pytest.mark.asyncio
+    async def test_gives_up_above_max_retry_after(self):
+        """Testa que um Retry-After acima do limite não gera espera"""
+        send = AsyncMock(side_effect=[_response(429, '3600')])
+        with patch('src.utils.http_retry.asyncio.sleep', new=AsyncMock()) as sleep:
+            async with retry_request(send, 'CRM', max_retry_after=600) as response:
+                assert response.status == 429
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_bounded_attempts(self):
+        """Testa que o número de tentativas é limitado"""
+        send = AsyncMock(side_effect=[_response(429, '0') for _ in range(3)])
+        with patch('src.utils.http_retry.asyncio.sleep', new=AsyncMock()):
+            async with retry_request(send, 'G-Click', max_attempts=3) as response:
+                assert response.status == 429
+        assert send.await_count == 3
@@ -0,0 +1,140 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+from src.database.connection import DatabaseConnection
+from src.main import _run_pipeline, main
+from src.models.company import Company
+
+def _company(cnpj):
+    return Company(
+        cnpj=cnpj,
+        razao_social=f'Empresa {cnpj} LTDA',
+        nome_fantasia=None,
+        email=f'contato@{cnpj}.com.br',
+        telefone=None,
+        endereco=None,
+        cidade='São Luís',
+        estado='MA',
+        cep=None,
+        data_abertura=datetime(2024, 1, 15),
+        atividade_principal='Atividade de teste',
+        situacao='ATIVA'
+    )
+
+class FakeCNPJA:
+    """Entrega as páginas informadas e, opcionalmente, falha em seguida"""
+    
+    def __init__(self, *pages, error=None):
+        self.pages = pages
+        self.error = error
+    
+    async def iter_pages(self, date):
+        for page in self.pages:
+            yield [_company(cnpj) for cnpj in page]
+        if self.error:
+            raise self.error
+
+def _crm(supports_bulk=False):
+    crm = Mock()
+    crm.supports_bulk = supports_bulk
+    crm.create_lead = AsyncMock(side_effect=lambda company: f'crm-{company.cnpj}')
+    crm.create_leads_bulk = AsyncMock()
+    return crm
+
+def _gclick():
+    gclick = Mock()
+    gclick.send_email = AsyncMock(return_value=True)
+    return gclick
+
+async def _run(cnpja, crm, repository):
+    return await _run_pipeline('2024-01-15', cnpja, crm, _gclick(), repository, 3, Mock())
+
+class TestPipeline:
+    
+    @pytest.mark.asyncio
+    async def test_dedup_across_pages_and_database(self, repository):
+        """Testa que CNPJs já gravados ou repetidos entre páginas não são reprocessados"""
+        repository.save_lead(_company('11111111000111'), 'crm-antigo', True)
+        crm = _crm()
+        
+        stats = await _run(FakeCNPJA(['11111111000111', '22222222000122'],
+                                     ['22222222000122', '33333333000133']), crm, repository)
+        
+        assert stats == {'found': 4, 'processed': 2, 'duplicated': 2, 'failed': 0}
+        assert sorted(call.args[0].cnpj for call in crm.create_lead.await_args_list) == \
+            ['22222222000122', '33333333000133']
+    
+    @pytest.mark.asyncio
+    async def test_final_flush_saves_partial_batch(self, repository):
+        """Testa que leads abaixo de BULK_INSERT_SIZE são gravados ao final, sem os que falharam"""
+        async def create_lead(company):
+            if company.cnpj == '22222222000122':
+                raise Exception('CRM fora')
+            return f'crm-{company.cnpj}'
+        
+        crm = _crm()
+        crm.create_lead.side_effect = create_lead
+        
+        stats = await _run(FakeCNPJA(['11111111000111', '22222222000122', '33333333000133']), crm, repository)
+        
+        assert stats == {'found': 3, 'processed': 2, 'duplicated': 0, 'failed': 1}
+        assert repository.existing_cnpjs(['11111111000111', '22222222000122', '33333333000133']) == \
+            {'11111111000111', '33333333000133'}
+        assert not repository.db._conn.in_transaction
+    
+    @pytest.mark.asyncio
+    async def test_cnpja_error_raised_after_queued_companies_are_saved(self, repository):
+        """Testa que uma falha do CNPJá é propagada só depois de gravar as empresas já enfileiradas"""
+        cnpja = FakeCNPJA(['11111111000111', '22222222000122'], error=Exception('CNPJá fora'))
+        
+        with pytest.raises(Exception, match='CNPJá fora'):
+            await _run(cnpja, _crm(), repository)
+        
+        assert repository.existing_cnpjs(['11111111000111', '22222222000122']) == \
+            {'11111111000111', '22222222000122'}
+    
+    @pytest.mark.asyncio
+    async def test_bulk_rejected_items_fall_back_to_create_lead(self, repository):
+        """Testa que só os itens recusados no lote do CRM são cadastrados individualmente"""
+        crm = _crm(supports_bulk=True)
+        crm.create_leads_bulk.return_value = ['crm-lote-1', None]
+        
+        stats = await _run(FakeCNPJA(['11111111000111', '22222222000122']), crm, repository)
+        
+        assert stats['processed'] == 2
+        assert [call.args[0].cnpj for call in crm.create_lead.await_args_list] == ['22222222000122']
+        assert repository.get_lead_by_cnpj('11111111000111')['crm_lead_id'] == 'crm-lote-1'
+        assert repository.get_lead_by_cnpj('22222222000122')['crm_lead_id'] == 'crm-22222222000122'
+    
+    @pytest.mark.asyncio
+    async def test_bulk_failure_falls_back_per_company(self, repository):
+        """Testa que uma falha do lote do CRM cadastra cada empresa individualmente"""
+        crm = _crm(supports_bulk=True)
+        crm.create_leads_bulk.side_effect = Exception('CRM fora')
+        
+        stats = await _run(FakeCNPJA(['11111111000111', '22222222000122']), crm, repository)
+        
+        assert stats == {'found': 2, 'processed': 2, 'duplicated': 0, 'failed': 0}
+        assert crm.create_lead.await_count == 2
+
+class TestMain:
+    
+    @pytest.mark.asyncio
+    async def test_closes_database_at_the_end(self, tmp_path):
+        """Testa que main() fecha a conexão SQLite, fazendo o checkpoint do WAL"""
+        config = {'apis': {
+            'cnpja': {'base_url': 'http://cnpja.test', 'token': 'test_token'},
+            'crm_4c': {'base_url': 'http://crm.test', 'api_key': 'test_api_key'},
+            'gclick': {'base_url': 'http://gclick.test', 'token': 'test_token'}
+        }}
+        stats = {'found': 0, 'processed': 0, 'duplicated': 0, 'failed': 0}
+        
+        with patch('src.database.connection.get_database_path', return_value=str(tmp_path / 'leads.db')), \
+                patch('src.main.load_config', return_value=config), \
+                patch('src.main._run_pipeline', new=AsyncMock(return_value=stats)), \
+                patch.object(DatabaseConnection, 'close', autospec=True,
+                             side_effect=DatabaseConnection.close) as close:
+            await main()
+        
+        close.assert_called_once()
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['leads.db']
@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import datetime
+from unittest.mock import Mock
+from src.main import _flush_leads
+from src.models.company import Company
+
+def _company(cnpj, **fields):
+    data = {
+        'cnpj': cnpj,
+        'razao_social': 'Empresa Teste LTDA',
+        'nome_fantasia': None,
+        'email': 'contato@empresateste.com.br',
+        'telefone': None,
+        'endereco': None,
+        'cidade': 'São Luís',
+        'estado': 'MA',
+        'cep': None,
+        'data_abertura': datetime(2024, 1, 15),
+        'atividade_principal': 'Atividade de teste',
+        'situacao': 'ATIVA'
+    }
+    data.update(fields)
+    return Company(**data)
+
+class TestLeadRepository:
+
+    def test_save_leads_bulk_skips_duplicates(self, repository):
+        """Testa que o executemany ignora CNPJs já gravados"""
+        repository.save_lead(_company('11222333000181'), 'crm-1', True)
+
+        inserted = repository.save_leads_bulk([
+            (_company('11222333000181'), 'crm-1', True),
+            (_company('11444777000161'), 'crm-2', True)
+        ])
+
+        assert inserted == 1
+        assert repository.existing_cnpjs(['11222333000181', '11444777000161']) == {'11222333000181', '11444777000161'}
+
+    def test_flush_keeps_good_rows_when_one_fails(self, repository):
+        """Testa que uma linha inválida não descarta o lote inteiro"""
+        invalid = _company('19131243000197')
+        invalid.cnpj = None  # viola o NOT NULL de leads.cnpj
+        pending = [
+            (_company('11222333000181'), 'crm-1', True),
+            (invalid, 'crm-2', True),
+            (_company('11444777000161', atividade_principal=None), 'crm-3', True)
+        ]
+
+        assert _flush_leads(repository, pending, Mock()) == (2, 0, 1)
+        assert pending == []
+        assert repository.existing_cnpjs(['11222333000181', '11444777000161']) == {'11222333000181', '11444777000161'}
+        assert not repository.db._conn.in_transaction
+
+    def test_close_runs_optimize_and_drops_redundant_index(self, repository):
+        """Testa que as estatísticas são gravadas ao fechar e que idx_leads_created_at não existe"""
+        with repository.transaction():
+            repository.save_leads_bulk([(_company(f'{i:014d}'), None, True) for i in range(1, 50)])
+        repository.get_statistics()
+        repository.db.close()
+        
+        conn = sqlite3.connect(repository.db.db_path)
+        try:
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            assert 'idx_leads_created_at' not in indexes
+            assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'leads'").fetchone()[0] > 0
+        finally:
+            conn.close()
@@ -1,7 +1,8 @@
 import pytest
 import asyncio
+import orjson
 from datetime import datetime
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import Mock, MagicMock, patch, AsyncMock
 from src.services.cnpja_service import CNPJAService
 from src.services.crm_service import CRMService
 from src.services.gclick_service import GClickService
@@ -46,17 +47,170 @@ def sample_company():
         situacao='ATIVA'
     )
 
+def _cnpja_record(company):
+    """Monta um registro no formato retornado pelo endpoint /office do CNPJá"""
+    return {
+        'taxId': company.cnpj,
+        'company': {'name': company.razao_social},
+        'founded': company.data_abertura.strftime('%Y-%m-%d'),
+        'emails': [{'address': company.email}],
+        'address': {'city': company.cidade, 'state': company.estado, 'zip': company.cep},
+        'mainActivity': {'text': company.atividade_principal}
+    }
+
+def _mock_get(*pages):
+    """Simula session.get(...) como context manager assíncrono, uma resposta por chamada"""
+    contexts = []
+    for status, body, headers in pages:
+        response = AsyncMock()
+        response.status = status
+        response.headers = headers
+        response.read.return_value = orjson.dumps(body)
+        context = MagicMock()
+        context.__aenter__.return_value = response
+        context.__aexit__.return_value = False
+        contexts.append(context)
+    return Mock(side_effect=contexts)
+
+def _mock_post(*pages):
+    """Simula session.post(...) aguardado diretamente, como em retry_request"""
+    responses = []
+    for status, body, headers in pages:
+        response = AsyncMock()
+        response.status = status
+        response.headers = headers
+        response.read.return_value = orjson.dumps(body)
+        response.release = Mock()
+        responses.append(response)
+    return AsyncMock(side_effect=responses)
+
 class TestCNPJAService:
     
     @pytest.mark.asyncio
-    async def test_get_companies_by_date(self, sample_config):
+    async def test_get_companies_by_date(self, sample_config, sample_company):
         """Testa a busca de empresas por data"""
-        cnpja = CNPJAService(sample_config)
-        mock_response = AsyncMock()
-        mock_response.json.return_value = {
-            'data': [sample_company.to_dict()]
-        }
-        with patch('aiohttp.ClientSession.get', return_value=mock_response):
-            companies = await cnpja.get_companies_by_date('2024-01-15')
-            assert len(companies) == 1
-            assert companies[0].cnpj == sample_company.cnpj
\ No newline at end of file
+        get = _mock_get((200, {'records': [_cnpja_record(sample_company)]}, {}))
+        async with CNPJAService(sample_config) as cnpja:
+            with patch('aiohttp.ClientSession.get', get):
+                companies = await cnpja.get_companies_by_date('2024-01-15')
+                assert len(companies) == 1
+                assert companies[0].cnpj == sample_company.cnpj
+    
+    @pytest.mark.asyncio
+    async def test_pagination_follows_next_cursor(self, sample_config, sample_company):
+        """Testa que as páginas seguintes são buscadas pelo cursor 'next'"""
+        record = _cnpja_record(sample_company)
+        get = _mock_get(
+            (200, {'records': [record], 'next': 'cursor-2'}, {}),
+            (200, {'records': [{**record, 'taxId': '11222333000181'}]}, {})
+        )
+        async with CNPJAService(sample_config) as cnpja:
+            with patch('aiohttp.ClientSession.get', get):
+                companies = await cnpja.get_companies_by_date('2024-01-15')
+        
+        assert [company.cnpj for company in companies] == [sample_company.cnpj, '11222333000181']
+        assert get.call_count == 2
+        assert get.call_args_list[1].kwargs['params']['token'] == 'cursor-2'
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_retry(self, sample_config, sample_company):
+        """Testa que um 429 é repetido respeitando o Retry-After"""
+        get = _mock_get(
+            (429, {}, {'Retry-After': '3'}),
+            (200, {'records': [_cnpja_record(sample_company)]}, {})
+        )
+        async with CNPJAService(sample_config) as cnpja:
+            with patch('aiohttp.ClientSession.get', get), \
+                    patch('src.services.cnpja_service.asyncio.sleep', new=AsyncMock()) as sleep:
+                companies = await cnpja.get_companies_by_date('2024-01-15')
+        
+        assert len(companies) == 1
+        sleep.assert_awaited_once_with(3.0)
+
+class TestGClickService:
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_uses_default_backoff(self, sample_config, sample_company):
+        """Testa que um 429 sem Retry-After aguarda o backoff padrão do G-Click (60s)"""
+        post = _mock_post(
+            (429, {}, {}),
+            (200, {'message_id': 'msg-1'}, {})
+        )
+        async with GClickService(sample_config) as gclick:
+            with patch('aiohttp.ClientSession.post', post), \
+                    patch('src.utils.http_retry.asyncio.sleep', new=AsyncMock()) as sleep:
+                assert await gclick.send_email(sample_company)
+        
+        assert post.call_count == 2
+        assert 60 <= sleep.await_args.args[0] <= 61
+
+class TestCRMService:
+    
+    @staticmethod
+    def _companies():
+        return [
+            Company(cnpj=cnpj, razao_social=f'Empresa {cnpj}', nome_fantasia=None, email=None,
+                    telefone=None, endereco=None, cidade='São Luís', estado='MA', cep=None,
+                    data_abertura=datetime(2024, 1, 15), atividade_principal='Atividade de teste',
+                    situacao='ATIVA')
+            for cnpj in ('11222333000181', '11444777000161', '19131243000197')
+        ]
+    
+    async def _create_bulk(self, config, companies, status, body):
+        post = _mock_post((status, body, {}))
+        async with CRMService(config) as crm:
+            with patch('aiohttp.ClientSession.post', post):
+                return await crm.create_leads_bulk(companies)
+    
+    def test_opening_date_follows_reassignment(self, sample_config, sample_company):
+        """Testa que a data de captação acompanha data_abertura reatribuída após o primeiro uso"""
+        crm = CRMService(sample_config)
+        assert crm._prepare_lead_data(sample_company)['custom_fields']['data_captacao'] == '2024-01-15'
+        
+        sample_company.data_abertura = datetime(2024, 2, 1)
+        assert crm._prepare_lead_data(sample_company)['custom_fields']['data_captacao'] == '2024-02-01'
+        assert GClickService(sample_config)._prepare_email_data(sample_company)['custom_data']['data_captacao'] == '2024-02-01'
+    
+    def test_static_tags_not_shared_mutably(self, sample_config, sample_company):
+        """Testa que as tags são serializadas como array e não podem ser alteradas entre payloads"""
+        crm = CRMService(sample_config)
+        lead_data = crm._prepare_lead_data(sample_company)
+        
+        assert orjson.loads(orjson.dumps(lead_data))['tags'] == ['automacao', 'cnpja', 'empresa-nova']
+        with pytest.raises(AttributeError):
+            lead_data['tags'].append('extra')
+    
+    @pytest.mark.asyncio
+    async def test_bulk_partial_result_by_position(self, sample_config):
+        """Testa um 207 com itens recusados e já existentes, sem CNPJ nos itens"""
+        results = [{'id': 'lead-1'}, {'error': 'email inválido'}, {'existing_id': 'lead-3'}]
+        lead_ids = await self._create_bulk(sample_config, self._companies(), 207, {'results': results})
+        
+        assert lead_ids == ['lead-1', None, 'lead-3']
+    
+    @pytest.mark.asyncio
+    async def test_bulk_results_matched_by_cnpj(self, sample_config):
+        """Testa que resultados fora de ordem e incompletos são associados pelo CNPJ"""
+        results = [
+            {'cnpj': '19.131.243/0001-97', 'id': 'lead-3'},
+            {'cnpj': '11.222.333/0001-81', 'id': 'lead-1'}
+        ]
+        with patch('src.services.crm_service.logger') as logger:
+            lead_ids = await self._create_bulk(sample_config, self._companies(), 207, {'results': results})
+        
+        assert lead_ids == ['lead-1', None, 'lead-3']
+        assert 'resultados para um lote' in logger.warning.call_args_list[0].args[0]
+    
+    @pytest.mark.asyncio
+    async def test_bulk_short_results_without_cnpj_are_not_guessed(self, sample_config):
+        """Testa que, sem CNPJ e com contagem divergente, nenhum ID é atribuído pela posição"""
+        lead_ids = await self._create_bulk(sample_config, self._companies(), 200,
+                                           {'results': [{'id': 'lead-1'}, {'id': 'lead-2'}]})
+        
+        assert lead_ids == [None, None, None]
+    
+    @pytest.mark.asyncio
+    async def test_bulk_error_raises(self, sample_config):
+        """Testa que uma falha do endpoint de lote é propagada ao chamador"""
+        with pytest.raises(Exception, match='lote'):
+            await self._create_bulk(sample_config, self._companies(), 500, {})
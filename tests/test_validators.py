@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+from src.utils.validators import (
+    clean_cep, clean_phone, only_digits, validate_cnpj, validate_cnpj_batch, validate_email
+)
+
+class TestValidators:
+
+    def test_only_digits(self):
+        """Testa a remoção de caracteres não numéricos"""
+        assert only_digits('11.222.333/0001-81') == '11222333000181'
+        assert only_digits('(98) 9 9999-9999') == '98999999999'
+        # Dígitos não ASCII são descartados
+        assert only_digits('١٢3') == '3'
+
+    def test_validate_cnpj(self):
+        """Testa a validação de CNPJ com e sem formatação"""
+        assert validate_cnpj('11222333000181')
+        assert validate_cnpj('11.222.333/0001-81')
+        assert not validate_cnpj('11222333000182')
+        assert not validate_cnpj('00000000000000')
+        assert not validate_cnpj('123')
+
+    def test_validate_cnpj_batch(self):
+        """Testa que a validação em lote concorda com a individual"""
+        cnpjs = ['11222333000181', '11.222.333/0001-81', '11222333000182', '00000000000000', '123', '']
+        assert validate_cnpj_batch(cnpjs) == [validate_cnpj(cnpj) for cnpj in cnpjs]
+
+    def test_import_does_not_load_numpy(self):
+        """Testa que o numpy só é importado na primeira validação em lote"""
+        code = "import sys, src.models.company; assert 'numpy' not in sys.modules"
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=Path(__file__).parent.parent)
+    
+    def test_validate_email(self):
+        """Testa a validação de formato de e-mail"""
+        assert validate_email('contato@empresateste.com.br')
+        assert not validate_email('contato@empresateste')
+        assert not validate_email('contato@empresateste.com.br\n')
+        assert not validate_email(None)
+
+    def test_clean_phone_and_cep(self):
+        """Testa a limpeza de telefone e CEP"""
+        assert clean_phone('(11) 99999-9999') == '11999999999'
+        assert clean_phone('9999') is None
+        assert clean_cep('01234567') == '01234-567'